@@ -1,4 +1,8 @@
 # analysis.py
+from collections import defaultdict
+from functools import lru_cache
+
+import numpy as np
 
 # Placeholder for Prop Data (You will fetch this from the API later)
 # In a real scenario, this data would be passed from the API function.
@@ -13,53 +17,96 @@ def get_dummy_prop_data():
 
 # --- 1. Prop Trend Analysis (Simplified L/F Score) ---
 
+# Indicator per score: LOCK (3 or above), NEUTRAL (2), FADE (anything else)
+_TREND_TABLE = (('FADE', 'red'), ('NEUTRAL', 'orange'), ('LOCK', 'green'))
+
+@lru_cache(maxsize=8)
 def get_trend_indicator(score: int):
     """Maps the score (1-3) to a text indicator."""
-    if score >= 3:
-        return ('LOCK', 'green')
-    elif score == 2:
-        return ('NEUTRAL', 'orange')
-    else:
-        return ('FADE', 'red')
+    idx = 2 if score >= 3 else (1 if score == 2 else 0)
+    return _TREND_TABLE[idx]
 
-# --- 2. Slip Analyzer Logic (Correlation Risk) ---
+# Pre-rendered badge HTML per indicator
+_TREND_BADGES = {
+    (trend, color): f'<div style="background-color: {color}; color: white; padding: 5px; border-radius: 5px; text-align: center;">{trend}</div>'
+    for trend, color in _TREND_TABLE
+}
 
-def analyze_slip_risk(slip_selections: list):
-    """Analyzes the slip for correlation risk and assigns a warning."""
-    if not slip_selections:
-        return 0, None, 0
+def get_trend_badge(score: int):
+    """Maps the score (1-3) to the HTML badge for its text indicator."""
+    return _TREND_BADGES[get_trend_indicator(score)]
 
-    correlation_warning = None
-    correlation_penalty = 0
+# --- 2. Slip Analyzer Logic (Correlation Risk) ---
 
-    # 1. Detect Self-Correlation (Same Player, Different Prop in the same game)
-    player_prop_counts = {}
-    for selection in slip_selections:
-        key = (selection['playerName'], selection['propMarket'])
-        player_prop_counts[key] = player_prop_counts.get(key, 0) + 1
-
-    for count in player_prop_counts.values():
-        if count > 1:
-            correlation_penalty += 4
-            correlation_warning = 'EXTREME: Multiple picks from the same player/prop market (Self-Correlation).'
-            break
-
-    # 2. Detect High Game Correlation (More than 2 picks in the same game)
-    game_counts = {}
-    for selection in slip_selections:
-        game_id = selection['game_id']
-        game_counts[game_id] = game_counts.get(game_id, 0) + 1
-
-    for game_id, count in game_counts.items():
-        if count > 2 and not correlation_warning:
-            correlation_penalty += 2
-            correlation_warning = f'HIGH: {count} picks from the same game ({game_id}). Positive correlation risk.'
+def build_slip_arrays(slip_selections: list):
+    """Converts the slip (list of pick dicts) into parallel arrays for analysis."""
+    return {
+        'names': np.array([s['playerName'] for s in slip_selections], dtype=object),
+        'markets': np.array([s['propMarket'] for s in slip_selections], dtype=object),
+        'game_ids': np.array([s['game_id'] for s in slip_selections], dtype=object),
+        'trend_scores': np.array([s['trend_score'] for s in slip_selections], dtype=np.int8),
+    }
 
+# Warning codes returned by _risk_kernel
+_NO_WARNING = 0
+_GAME_CORRELATION = 1
+_SELF_CORRELATION = 2
+
+def _risk_kernel(trend_scores, player_prop_max, game_max):
+    """Numeric core of analyze_slip_risk: returns (risk score, warning code, trend strength)."""
     # 3. Calculate Trend Strength Score (TS)
-    total_trend_score = sum(selection['trend_score'] for selection in slip_selections)
-    trend_strength = total_trend_score / len(slip_selections)
+    trend_strength = float(trend_scores.mean()) # float64 accumulator, no int8 overflow
+
+    correlation_penalty = 0
+    warning_code = _NO_WARNING
+    if player_prop_max > 1:
+        correlation_penalty += 4
+        warning_code = _SELF_CORRELATION
+    elif game_max > 2:
+        correlation_penalty += 2
+        warning_code = _GAME_CORRELATION
 
     # Risk Score Formula (Lower is better): 10 - Trend Strength - Correlation Penalty
-    risk_score = 10 - trend_strength - correlation_penalty
-    
-    return max(0, risk_score), correlation_warning, trend_strength
\ No newline at end of file
+    risk_score = 10.0 - trend_strength - correlation_penalty
+    return max(0.0, risk_score), warning_code, trend_strength
+
+def analyze_slip_risk(slip_arrays: dict):
+    """Analyzes the slip (see build_slip_arrays) for correlation risk and assigns a warning."""
+    trend_scores = slip_arrays['trend_scores']
+    if not trend_scores.size:
+        return 0, None, 0
+
+    names, markets, game_ids = slip_arrays['names'], slip_arrays['markets'], slip_arrays['game_ids']
+    game_id = None
+    if trend_scores.size <= 2:
+        # Fast path: game correlation needs 3+ picks, and there is at most one pair to compare
+        same_pick = trend_scores.size == 2 and names[0] == names[1] and markets[0] == markets[1]
+        player_prop_max = 2 if same_pick else 1
+        game_max = 0
+    else:
+        # 1 & 2. Count player/prop and game repeats in a single pass
+        player_prop_counts = defaultdict(int)
+        game_counts = defaultdict(int)
+        for name, market, pick_game_id in zip(names, markets, game_ids):
+            key = (name, market)
+            player_prop_counts[key] += 1
+            if player_prop_counts[key] > 1:
+                # Self-correlation outranks game correlation, nothing left to find
+                break
+            game_counts[pick_game_id] += 1
+
+        player_prop_max = max(player_prop_counts.values())
+        game_id = max(game_counts, key=game_counts.get) # Earliest game on ties
+        game_max = game_counts[game_id]
+
+    risk_score, warning_code, trend_strength = _risk_kernel(trend_scores, player_prop_max, game_max)
+
+    correlation_warning = None
+    if warning_code == _SELF_CORRELATION:
+        # Self-Correlation (Same Player, Different Prop in the same game)
+        correlation_warning = 'EXTREME: Multiple picks from the same player/prop market (Self-Correlation).'
+    elif warning_code == _GAME_CORRELATION:
+        # High Game Correlation (More than 2 picks in the same game)
+        correlation_warning = f'HIGH: {game_max} picks from the same game ({game_id}). Positive correlation risk.'
+
+    return risk_score, correlation_warning, trend_strength
@@ -0,0 +1,38 @@
+# firebase_client.py
+import threading
+
+# Firestore client singleton. It lives in an imported module so it survives Streamlit
+# reruns (the main script is re-executed each time); a failed init is remembered too.
+_db = None
+_error = None
+_init_lock = threading.Lock()
+
+def _initialize():
+    """Initializes the Firebase Admin SDK (Auth & Firestore) once per process."""
+    global _db, _error
+    with _init_lock:
+        if _db is not None or _error is not None:
+            return # Another session got here first
+        # Imported here so pages without Firebase don't pay its import time
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+        try:
+            if not firebase_admin._apps:
+                # Initialize with the private key file for Admin SDK
+                cred = credentials.Certificate("firebase-key.json")
+                firebase_admin.initialize_app(cred)
+            _db = firestore.client()
+        except Exception as e:
+            # NOTE: This error means 'firebase-key.json' is missing or invalid.
+            _error = e
+
+def get_db():
+    """Returns the Firestore client, or None if Firebase failed to initialize."""
+    if _db is None and _error is None:
+        _initialize()
+    return _db
+
+def get_db_error():
+    """Returns the exception from a failed Firebase initialization, if any."""
+    get_db()
+    return _error
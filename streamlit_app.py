@@ -1,76 +1,118 @@
 import streamlit as st
-import pandas as pd
+import logging
+import sys
+import threading
 import time
-# Firebase and Firestore Imports
-from google.cloud import firestore
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
-from analysis import get_dummy_prop_data, analyze_slip_risk, get_trend_indicator
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+# Firebase and Firestore are imported inside the functions that use them, so pages
+# without Firebase (Players, Slip) don't pay its import time.
+from analysis import get_dummy_prop_data, build_slip_arrays, analyze_slip_risk, get_trend_badge
+from firebase_client import get_db, get_db_error
 
 # --- 0. Configuration and Initialization ---
 
 st.set_page_config(layout="wide", page_title="Peezy AI Prop Builder")
 
-# Function to initialize the Firebase Admin SDK (Auth & Firestore)
-@st.cache_resource
-def initialize_firebase():
-    try:
-        if not firebase_admin._apps:
-            # Initialize with the private key file for Admin SDK
-            cred = credentials.Certificate("firebase-key.json")
-            firebase_admin.initialize_app(cred)
-        
-        db = firestore.client()
-        return db
-    except Exception as e:
-        # NOTE: This error means 'firebase-key.json' is missing or invalid.
-        st.error(f"Firebase Initialization Error. Check firebase-key.json: {e}")
-        return None
-
-db = initialize_firebase()
-
 # Global state for user status and data
 if 'user' not in st.session_state:
     st.session_state.user = None
 if 'slip' not in st.session_state:
     st.session_state.slip = []
+if 'slip_arrays' not in st.session_state:
+    st.session_state.slip_arrays = build_slip_arrays([])
+if 'slip_ids' not in st.session_state:
+    st.session_state.slip_ids = set()
 if 'watchlist' not in st.session_state:
     st.session_state.watchlist = []
+if 'watchlist_ids' not in st.session_state:
+    st.session_state.watchlist_ids = set()
+if 'notices' not in st.session_state:
+    st.session_state.notices = []
 
 # --- 1. Watchlist and Slip Functions ---
 
+# Widget callbacks queue their toasts instead of displaying them: during a fragment
+# rerun, elements written from a callback would land at the top of the app.
+def _notify(message, icon=None):
+    st.session_state.notices.append((message, icon))
+
+def _show_notices():
+    while st.session_state.notices:
+        message, icon = st.session_state.notices.pop(0)
+        st.toast(message, icon=icon)
+
+# Errors propagate to the caller so only successful fetches are cached.
+@st.cache_data(ttl=30, show_spinner=False)
 def load_watchlist(user_id):
-    """Fetches the user's watchlist from Firestore."""
+    """Fetches the user's watchlist from Firestore (cached per user)."""
+    db = get_db()
     if not db or not user_id: return []
-    try:
-        doc_ref = db.collection("watchlists").document(user_id)
-        doc = doc_ref.get()
-        if doc.exists:
-            return doc.to_dict().get("props", [])
-        return []
-    except Exception as e:
-        st.warning(f"Error loading watchlist: {e}")
-        return []
+    doc_ref = db.collection("watchlists").document(user_id)
+    doc = doc_ref.get()
+    if doc.exists:
+        return doc.to_dict().get("props", [])
+    return []
+
+# Single background writer plus the pending write per user (and its lock), shared across reruns and sessions
+@st.cache_resource
+def _watchlist_writer():
+    return ThreadPoolExecutor(max_workers=1), {}, threading.Lock()
+
+def _write_watchlist(db, user_id, props):
+    doc_ref = db.collection("watchlists").document(user_id)
+    doc_ref.set({"props": props})
+    load_watchlist.clear(user_id) # Next load for this user must see the saved doc
+
+def _on_watchlist_saved(pending, lock, user_id, future):
+    """Logs a failed write; forgets a successful one so the pending map stays small."""
+    if future.cancelled():
+        return
+    if future.exception():
+        logging.getLogger(__name__).error("Error saving watchlist for %s", user_id, exc_info=future.exception())
+        return # Kept so the user's next rerun can report it
+    with lock:
+        if pending.get(user_id) is future:
+            del pending[user_id]
 
 def save_watchlist(user_id, props):
-    """Saves the updated watchlist back to Firestore."""
+    """Queues the updated watchlist to be saved back to Firestore without blocking the UI."""
+    db = get_db()
     if not db or not user_id: return
-    try:
-        doc_ref = db.collection("watchlists").document(user_id)
-        doc_ref.set({"props": props})
-    except Exception as e:
-        st.error(f"Error saving watchlist: {e}")
+    executor, pending, lock = _watchlist_writer()
+    future = executor.submit(_write_watchlist, db, user_id, list(props))
+    with lock:
+        previous = pending.get(user_id)
+        pending[user_id] = future
+    # A write still queued is superseded by this newer snapshot; a finished one may hold an error.
+    if previous and not previous.cancel() and previous.done() and previous.exception():
+        _notify(f"Error saving watchlist: {previous.exception()}", icon="🚨")
+    future.add_done_callback(partial(_on_watchlist_saved, pending, lock, user_id))
+
+def report_watchlist_save_error(user_id):
+    """Shows the error from the user's last background watchlist save, if it failed."""
+    _, pending, lock = _watchlist_writer()
+    with lock:
+        future = pending.get(user_id)
+        if not future or not future.done():
+            return
+        del pending[user_id]
+    if not future.cancelled() and future.exception():
+        st.error(f"Error saving watchlist: {future.exception()}")
 
 def toggle_watchlist(prop_data):
     """Adds or removes a prop from the watchlist."""
     if not st.session_state.user:
-        st.warning("Please log in to manage your watchlist.")
+        _notify("Please log in to manage your watchlist.", icon="⚠️")
         return
         
     prop_id = prop_data['id']
-    if prop_id in [p['id'] for p in st.session_state.watchlist]:
-        st.session_state.watchlist = [p for p in st.session_state.watchlist if p['id'] != prop_id]
-        st.sidebar.success(f"Removed {prop_data['playerName']} from Watchlist!")
+    if prop_id in st.session_state.watchlist_ids:
+        # Delete in place: the generator stops at the match instead of copying the whole watchlist
+        watchlist = st.session_state.watchlist
+        del watchlist[next(i for i, p in enumerate(watchlist) if p['id'] == prop_id)]
+        st.session_state.watchlist_ids.discard(prop_id)
+        _notify(f"Removed {prop_data['name']} from Watchlist!")
     else:
         st.session_state.watchlist.append({
             'id': prop_data['id'],
@@ -78,117 +120,143 @@ def toggle_watchlist(prop_data):
             'market': prop_data['market'],
             'line': prop_data['line'],
         })
-        st.sidebar.success(f"Added {prop_data['playerName']} to Watchlist!")
+        st.session_state.watchlist_ids.add(prop_id)
+        _notify(f"Added {prop_data['name']} to Watchlist!")
     
     # Save change back to Firebase
     save_watchlist(st.session_state.user['uid'], st.session_state.watchlist)
-    time.sleep(0.1) # small delay for UI update
 
 def add_to_slip(prop_data, selection):
     if len(st.session_state.slip) >= 6:
-        st.warning("Maximum of 6 picks allowed in the slip.")
+        _notify("Maximum of 6 picks allowed in the slip.", icon="⚠️")
         return
     if not st.session_state.user:
-        st.warning("Please log in to create a slip.")
+        _notify("Please log in to create a slip.", icon="⚠️")
         return
 
     prop_id = prop_data['id']
-    if any(item['id'] == prop_id for item in st.session_state.slip):
-        st.warning("This prop is already in your slip.")
+    if prop_id in st.session_state.slip_ids:
+        _notify("This prop is already in your slip.", icon="⚠️")
         return
 
+    # Interned so analyze_slip_risk's key comparisons hit the pointer-equality fast path
     st.session_state.slip.append({
         'id': prop_id,
-        'playerName': prop_data['name'],
-        'propMarket': prop_data['market'],
+        'playerName': sys.intern(prop_data['name']),
+        'propMarket': sys.intern(prop_data['market']),
         'line': prop_data['line'],
         'selection': selection,
         'trend_score': prop_data['trend_score'],
-        'game_id': prop_data['game_id'],
+        'game_id': sys.intern(prop_data['game_id']),
     })
+    st.session_state.slip_ids.add(prop_id)
+    st.session_state.slip_arrays = build_slip_arrays(st.session_state.slip)
 
 def remove_from_slip(prop_id):
     st.session_state.slip = [
         item for item in st.session_state.slip if item['id'] != prop_id
     ]
+    st.session_state.slip_ids.discard(prop_id)
+    st.session_state.slip_arrays = build_slip_arrays(st.session_state.slip)
 
 # --- 2. Authentication Functions ---
 
 def handle_login(email, password):
     """Attempts to sign in a user (simplified for Admin SDK environment)."""
-    if not db: return st.error("Database connection failed.")
+    if not get_db(): return st.error("Database connection failed.")
+    from firebase_admin import auth, exceptions
     try:
         user = auth.get_user_by_email(email)
         # NOTE: Admin SDK cannot verify password. We assume success if user exists.
         st.session_state.user = {'email': user.email, 'uid': user.uid}
-        st.session_state.watchlist = load_watchlist(user.uid)
-        st.success(f"Welcome back, {user.email}!")
-        time.sleep(1)
-        st.experimental_rerun()
+        try:
+            st.session_state.watchlist = load_watchlist(user.uid)
+        except Exception as e:
+            # Toast, not warning: it has to survive the rerun below
+            st.toast(f"Error loading watchlist: {e}", icon="⚠️")
+            st.session_state.watchlist = []
+        st.session_state.watchlist_ids = {p['id'] for p in st.session_state.watchlist}
+        st.toast(f"Welcome back, {user.email}!", icon="✅")
+        st.rerun()
         
-    except firebase_admin.exceptions.FirebaseError as e:
+    except exceptions.FirebaseError as e:
         st.error(f"Login Failed. Check email/password. (Admin API Error: {e})")
 
 def handle_signup(email, password):
     """Attempts to create a new user."""
-    if not db: return st.error("Database connection failed.")
+    if not get_db(): return st.error("Database connection failed.")
     if len(password) < 6: return st.error("Password must be at least 6 characters.")
+    from firebase_admin import auth, exceptions
         
     try:
         user = auth.create_user(email=email, password=password)
         st.session_state.user = {'email': user.email, 'uid': user.uid}
         st.session_state.watchlist = [] # New user starts with empty watchlist
-        st.success(f"Account created for {user.email}! Logging you in...")
-        time.sleep(1)
-        st.experimental_rerun()
-    except firebase_admin.exceptions.FirebaseError as e:
+        st.session_state.watchlist_ids = set()
+        st.toast(f"Account created for {user.email}! Logging you in...", icon="✅")
+        st.rerun()
+    except exceptions.FirebaseError as e:
         st.error(f"Signup Failed: {e}")
 
 def handle_logout():
     st.session_state.user = None
     st.session_state.watchlist = []
+    st.session_state.watchlist_ids = set()
     st.session_state.slip = []
-    st.success("Logged out successfully.")
-    time.sleep(1)
-    st.experimental_rerun()
+    st.session_state.slip_arrays = build_slip_arrays([])
+    st.session_state.slip_ids = set()
+    st.toast("Logged out successfully.", icon="✅")
+    st.rerun()
 
 # --- 3. Player Prop Display Component ---
 
+# Cached per sport so search-box reruns don't re-pay the fetch.
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_props(sport):
+    time.sleep(1) # Simulate network delay
+    props = get_dummy_prop_data()
+    # Pre-render card text once per fetch instead of on every rerun
+    for p in props:
+        p['_md_info'] = f"**{p['name']}** ({p['market']})  \nLine: **{p['line']}**"
+        p['_btn_over'] = f"OVER {p['line']}"
+        p['_btn_under'] = f"UNDER {p['line']}"
+    return props
+
+# Prop table with a pre-lowercased name column for vectorized search.
+@st.cache_data(ttl=60, show_spinner=False)
+def _props_df(sport):
+    import pandas as pd # Deferred: only needed once per cache miss, keeps it off the cold start
+    df = pd.DataFrame(_fetch_props(sport))
+    df['name_lc'] = df['name'].str.lower()
+    return df
+
+@st.fragment
 def display_player_prop(prop):
     """Displays a single player prop card with L/F analysis and Watchlist button."""
-    trend, color = get_trend_indicator(prop['trend_score'])
-    
+    _show_notices() # Feedback from this card's callbacks on a fragment rerun
     is_watched = False
     if st.session_state.user:
-        is_watched = prop['id'] in [p['id'] for p in st.session_state.watchlist]
+        is_watched = prop['id'] in st.session_state.watchlist_ids
         
     watch_icon = "⭐ Watching" if is_watched else "☆ Watch"
 
-    col1, col2, col3 = st.columns([0.5, 0.2, 0.3])
+    # Whole card on one row: a single st.columns call per prop
+    c_info, c_trend, c_watch, c_over, c_under = st.columns([0.35, 0.15, 0.2, 0.15, 0.15])
     
-    with col1:
-        st.markdown(f"**{prop['name']}** ({prop['market']})")
-        st.markdown(f"Line: **{prop['line']}**")
-        
-    with col2:
-        st.markdown(f'<div style="background-color: {color}; color: white; padding: 5px; border-radius: 5px; text-align: center;">{trend}</div>', unsafe_allow_html=True)
-        
-    with col3:
-        # Note: toggle_watchlist uses the full prop dict.
-        st.button(watch_icon, key=f"W_{prop['id']}", 
-                  on_click=toggle_watchlist, args=(prop,), 
-                  use_container_width=True, help="Add or remove from your watchlist")
+    c_info.markdown(prop['_md_info'])
+    c_trend.markdown(get_trend_badge(prop['trend_score']), unsafe_allow_html=True)
+    # Note: toggle_watchlist uses the full prop dict.
+    c_watch.button(watch_icon, key=f"W_{prop['id']}", 
+                   on_click=toggle_watchlist, args=(prop,), 
+                   use_container_width=True, help="Add or remove from your watchlist")
 
     # Selection buttons
-    c_over, c_under = st.columns(2)
-    with c_over:
-        st.button(f"OVER {prop['line']}", key=f"O_{prop['id']}", 
+    c_over.button(prop['_btn_over'], key=f"O_{prop['id']}", 
                   on_click=add_to_slip, args=(prop, 'OVER'), 
                   use_container_width=True)
-    with c_under:
-        st.button(f"UNDER {prop['line']}", key=f"U_{prop['id']}", 
-                  on_click=add_to_slip, args=(prop, 'UNDER'), 
-                  use_container_width=True)
+    c_under.button(prop['_btn_under'], key=f"U_{prop['id']}", 
+                   on_click=add_to_slip, args=(prop, 'UNDER'), 
+                   use_container_width=True)
     st.divider()
 
 # --- 4. Main App Layout ---
@@ -197,6 +265,12 @@ st.title("🏀 Peezy AI Prop Builder")
 
 page = st.sidebar.radio("Navigation", ["Players (Search)", "Build Slip (Analyzer)", "Profile (Login)"])
 
+_show_notices()
+
+# A failed background watchlist save shows up on the next full rerun
+if st.session_state.user:
+    report_watchlist_save_error(st.session_state.user['uid'])
+
 # --- PLAYERS SCREEN ---
 if page == "Players (Search)":
     st.header("Search & Select Player Props")
@@ -207,12 +281,11 @@ if page == "Players (Search)":
     
     # Simulate API Fetch (Requirement 4)
     with st.spinner(f"Fetching live lines for {sport_filter}..."):
-        time.sleep(1) # Simulate network delay
-        all_props = get_dummy_prop_data()
+        props_df = _props_df(sport_filter)
     
-    filtered_props = [
-        p for p in all_props if search_term.lower() in p['name'].lower()
-    ]
+    if search_term:
+        props_df = props_df[props_df['name_lc'].str.contains(search_term.lower(), regex=False)]
+    filtered_props = props_df.drop(columns='name_lc').to_dict('records')
 
     if filtered_props:
         for prop in filtered_props:
@@ -232,16 +305,15 @@ elif page == "Build Slip (Analyzer)":
         # --- Display Current Slip ---
         st.subheader(f"Current Picks ({len(st.session_state.slip)}/6)")
         for i, pick in enumerate(st.session_state.slip):
-            c_p1, c_p2, c_p3 = st.columns([0.1, 0.7, 0.2])
-            c_p1.markdown(f"**{i+1}.**")
-            c_p2.markdown(f"**{pick['playerName']}** | {pick['propMarket']} **{pick['selection']}** {pick['line']}")
-            c_p3.button("Remove", key=f"R_{pick['id']}", on_click=remove_from_slip, args=(pick['id'],), use_container_width=True)
+            c_p1, c_p2 = st.columns([0.8, 0.2])
+            c_p1.markdown(f"**{i+1}.** **{pick['playerName']}** | {pick['propMarket']} **{pick['selection']}** {pick['line']}")
+            c_p2.button("Remove", key=f"R_{pick['id']}", on_click=remove_from_slip, args=(pick['id'],), use_container_width=True)
         
         st.divider()
 
         # --- Analysis Section (Requirement 1) ---
         st.subheader("Slip Risk Analysis")
-        risk_score, warning, trend_strength = analyze_slip_risk(st.session_state.slip)
+        risk_score, warning, trend_strength = analyze_slip_risk(st.session_state.slip_arrays)
         
         st.metric(
             label="Overall Risk Score (Lower is better)",
@@ -258,7 +330,7 @@ elif page == "Build Slip (Analyzer)":
 elif page == "Profile (Login)":
     st.header("User Profile & Watchlist")
     
-    if not db:
-        st.error("Firebase is not connected. Please check 'firebase-key.json'.")
+    if not get_db():
+        st.error(f"Firebase is not connected. Please check 'firebase-key.json'. ({get_db_error()})")
     
     if st
\ No newline at end of file